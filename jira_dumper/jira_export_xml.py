@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 import os
 import csv
+import json
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
 import click
+import httpx
 from playwright.sync_api import sync_playwright
 
 # Load environment variables from .env file
@@ -25,24 +28,84 @@ if not OUTPUT_DIR.exists():
 # Default Base URL
 DEFAULT_BASE_URL = os.getenv("JIRA_BASE_URL")
 
-# Selector for XML link in the export dropdown
-XML_LINK_SELECTOR = 'a[href*="jira.issueviews:issue-xml"]'
+# Well-known XML export endpoint; deriving it from the issue key avoids any
+# round-trip to the issue's HTML page
+XML_EXPORT_URL_TEMPLATE = "{base_url}/si/jira.issueviews:issue-xml/{key}/{key}.xml"
 
 def load_csv_files(file_paths):
     """Load issue keys from the provided file paths."""
     issues = []
     for file_path in file_paths:
         with open(file_path, newline="") as csvfile:
-            reader = csv.DictReader(csvfile)
+            # Resolve the key column once from the header; plain csv.reader
+            # avoids building a dict per row
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header is None:
+                continue
+            key_index = header.index("key")
             for row in reader:
-                issues.append((row["key"], file_path))  # Include the file path for project extraction
+                issues.append((row[key_index], file_path))  # Include the file path for project extraction
     return issues
 
 
+def login_and_get_cookies(base_url):
+    """Return session cookies, running the manual Playwright login flow if needed.
+
+    The browser is only used to establish the session; all subsequent
+    fetching goes through plain HTTP.
+    """
+    if os.path.exists(STORAGE_STATE_PATH):
+        print(f"🔐 Using existing login state from: {STORAGE_STATE_PATH}")
+        with open(STORAGE_STATE_PATH, "r") as f:
+            return json.load(f).get("cookies", [])
+
+    print("🟡 No stored login state found. Starting manual login flow...")
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=False)
+        context = browser.new_context()
+        page = context.new_page()
+        page.goto(f"{base_url}/login")
+        print(
+            "\nPlease log in manually in the opened browser window."
+            " Once logged in, press ENTER here to continue.\n"
+        )
+        input("Press ENTER to continue...")  # Wait for user input
+        context.storage_state(path=STORAGE_STATE_PATH)
+        print(f"🟢 Saved authenticated state to: {STORAGE_STATE_PATH}")
+        cookies = context.cookies()
+        browser.close()
+    return cookies
+
+
+def build_client(cookies):
+    """Build an async HTTP client carrying the authenticated session cookies."""
+    jar = httpx.Cookies()
+    for cookie in cookies:
+        jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    # Force a single HTTP/2 connection: the exports are many small objects,
+    # so multiplexing them over one warmed connection beats opening new ones.
+    return httpx.AsyncClient(
+        cookies=jar,
+        http2=True,
+        http1=False,
+        limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+        timeout=httpx.Timeout(30.0),
+        follow_redirects=True,
+    )
+
+
+# Project directories already created this run; every issue in a CSV shares
+# one project, so mkdir only needs to run once per project
+_created_project_dirs = set()
+
+
 def save_xml_file(project, key, xml_content):
     """Save the XML content to a file."""
     project_dir = OUTPUT_DIR / project
-    project_dir.mkdir(parents=True, exist_ok=True)
+    if project not in _created_project_dirs:
+        project_dir.mkdir(parents=True, exist_ok=True)
+        _created_project_dirs.add(project)
     file_path = project_dir / f"{key}.xml"
 
     with open(file_path, "w", encoding="utf-8") as file:
@@ -50,42 +113,30 @@ def save_xml_file(project, key, xml_content):
     print(f"📁 Saved XML for {key} to {file_path}")
 
 
-def process_issues(base_url, issues, page):
+async def process_issues(base_url, issues, client, max_concurrency):
     """Process issues to download and save XML."""
-    for key, csv_file in issues:
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(key, csv_file):
         # Extract project name from the CSV file name
         project = Path(csv_file).stem.upper()
 
-        # Navigate to the issue page
-        issue_url = f"{base_url}/browse/{key}"
-        print(f"🌐 Navigating to {issue_url}...")
-        response = page.goto(issue_url)
+        xml_url = XML_EXPORT_URL_TEMPLATE.format(base_url=base_url, key=key)
+        async with semaphore:
+            print(f"📥 Downloading XML for {key}...")
+            try:
+                response = await client.get(xml_url)
+            except httpx.HTTPError as e:
+                print(f"❌ Failed to download XML for {key}: {e}. Skipping...")
+                return
+            if response.status_code != 200:
+                print(f"❌ Failed to download XML for {key} (HTTP {response.status_code}). Skipping...")
+                return
 
-        # Check if the page loaded successfully
-        if response.status != 200:
-            print(f"❌ Failed to load {key} (HTTP {response.status}). Skipping...")
-            continue
+            # Save the XML content
+            save_xml_file(project, key, response.text)
 
-        # Find the XML link directly
-        xml_link_element = page.query_selector(XML_LINK_SELECTOR)
-        if not xml_link_element:
-            print(f"❌ XML export link not found for {key}. Skipping...")
-            continue
-
-        xml_url = xml_link_element.get_attribute("href")
-        if not xml_url:
-            print(f"❌ Failed to get XML export URL for {key}. Skipping...")
-            continue
-
-        # Download the XML
-        print(f"📥 Downloading XML for {key}...")
-        xml_response = page.goto(base_url + xml_url)
-        if xml_response.status != 200:
-            print(f"❌ Failed to download XML for {key} (HTTP {xml_response.status}). Skipping...")
-            continue
-
-        # Save the XML content
-        save_xml_file(project, key, xml_response.text())
+    await asyncio.gather(*[fetch(key, csv_file) for key, csv_file in issues])
 
 
 @click.command()
@@ -95,7 +146,8 @@ def process_issues(base_url, issues, page):
     default=DEFAULT_BASE_URL,
     help="The base URL of the Jira instance (set via JIRA_BASE_URL in .env file).",
 )
-def main(files, base_url):
+@click.option("--max-concurrency", default=5, show_default=True, help="Maximum number of XML downloads in flight at once.")
+def main(files, base_url, max_concurrency):
     """
     Download issues from CSV files and save their XML exports.
 
@@ -111,40 +163,13 @@ def main(files, base_url):
         print("❌ No issues found in the provided CSV files. Exiting...")
         return
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)  # Use a single browser instance
-        context = None
-        try:
-            # Check if auth state exists
-            if os.path.exists(STORAGE_STATE_PATH):
-                print(f"🔐 Using existing login state from: {STORAGE_STATE_PATH}")
-                context = browser.new_context(storage_state=STORAGE_STATE_PATH)
-            else:
-                print("🟡 No stored login state found. Starting manual login flow...")
-                context = browser.new_context()
-
-            page = context.new_page()
-
-            # If no auth state, allow manual login and save state
-            if not os.path.exists(STORAGE_STATE_PATH):
-                page.goto(f"{base_url}/login")
-                print(
-                    "\nPlease log in manually in the opened browser window."
-                    " Once logged in, press ENTER here to continue.\n"
-                )
-                input("Press ENTER to continue...")  # Wait for user input
-                context.storage_state(path=STORAGE_STATE_PATH)
-                print(f"🟢 Saved authenticated state to: {STORAGE_STATE_PATH}")
-
-            # Process issues
-            process_issues(base_url, issues, page)
-
-        except Exception as e:
-            print(f"❌ Error during execution: {e}")
-        finally:
-            if context:
-                context.close()
-            browser.close()
+    cookies = login_and_get_cookies(base_url)
+
+    async def run():
+        async with build_client(cookies) as client:
+            await process_issues(base_url, issues, client, max_concurrency)
+
+    asyncio.run(run())
 
 
 if __name__ == "__main__":
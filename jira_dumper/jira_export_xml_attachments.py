@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 import os
-import xml.etree.ElementTree as ET
+import asyncio
+from lxml import etree
 from pathlib import Path
 from urllib.parse import quote
 from tqdm import tqdm
 import json
 import click
 from time import strptime, mktime
-from playwright.sync_api import sync_playwright
+import aiofiles
+import httpx
 import glob
 
 # Load base URL from .env
@@ -18,156 +20,260 @@ BASE_URL = os.getenv("JIRA_BASE_URL")
 SCRIPT_DIR = Path(__file__).parent
 AUTH_STATE_PATH = SCRIPT_DIR / "auth_state.json"
 
-@click.command()
-@click.argument("file_patterns", nargs=-1)
-@click.option("--dry-run", is_flag=True, help="Simulate the download and display the attachment details.")
-@click.option("--force", is_flag=True, help="Force download of all files, regardless of existing timestamps.")
-def main(file_patterns, dry_run, force):
+MAX_RETRIES = 3  # Attempts per attachment before giving up on it
+RETRY_BACKOFF_SECONDS = 2  # Initial delay; doubles after each failed attempt
+MAX_PARALLEL_FILES = 4  # XML files processed concurrently
+
+# Elements iterparse is filtered to; the parser skips everything else
+PARSED_XML_TAGS = ("key", "attachment")
+
+
+def parse_issue_xml(xml_path):
+    """Stream-parse an issue XML export, returning (issue_key, attachments).
+
+    iterparse pulls just the <key> and <attachment> elements as they are
+    seen instead of building the whole document tree, so memory stays flat
+    even for exports with huge comment/history sections.
     """
-    Extract attachments from one or more Jira XML export files and optionally download them. For each file, a new directory named after the issue key will be created at the same path level as the input FILE.
+    issue_key = None
+    attachments = []
+    for _, element in etree.iterparse(str(xml_path), events=("end",), tag=PARSED_XML_TAGS):
+        if element.tag == "key":
+            # The first <key> in document order is the issue key
+            if issue_key is None:
+                issue_key = (element.text or "").strip()
+        else:
+            attachments.append(dict(element.attrib))
+        # The tag filter only limits reported events, not tree building:
+        # drop consumed elements and their processed siblings so the
+        # comment/history bulk between matches is actually released
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return issue_key, attachments
+
+
+def build_client():
+    """Build an async HTTP client carrying the authenticated session cookies."""
+    jar = httpx.Cookies()
+    if AUTH_STATE_PATH.exists():
+        with open(AUTH_STATE_PATH, "r") as f:
+            storage_state = json.load(f)
+        for cookie in storage_state.get("cookies", []):
+            jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    # Force a single HTTP/2 connection: concurrent downloads are multiplexed
+    # as streams over one warmed connection instead of opening new ones.
+    return httpx.AsyncClient(
+        cookies=jar,
+        http2=True,
+        http1=False,
+        limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+        timeout=httpx.Timeout(30.0),
+        follow_redirects=True,
+    )
+
+
+async def download_attachments(client, downloads, semaphore, pbar):
+    """Download queued attachments concurrently, bounded by the semaphore.
+
+    Failed downloads are retried with exponential backoff and then recorded;
+    one bad attachment no longer aborts the run.
+
+    Returns a (downloaded_files, downloaded_size, failed_files) tuple.
+    """
+    downloaded_files = 0
+    downloaded_size = 0
+    failed_files = 0
 
-    FILE_PATTERNS are the glob patterns for the XML files.
+    async def fetch(download_url, file_path, name, created_mtime, size):
+        nonlocal downloaded_files, downloaded_size, failed_files
+        async with semaphore:
+            try:
+                for attempt in range(1, MAX_RETRIES + 1):
+                    try:
+                        # Stream to disk in 1 MiB chunks so peak memory stays flat
+                        # regardless of attachment size
+                        async with client.stream("GET", download_url) as response:
+                            if response.status_code != 200:
+                                raise RuntimeError(f"Received HTTP {response.status_code} for {download_url}")
+
+                            async with aiofiles.open(file_path, "wb") as f:
+                                async for chunk in response.aiter_bytes(chunk_size=1 << 20):
+                                    await f.write(chunk)
+
+                        # Set the created timestamp on the file
+                        os.utime(file_path, (created_mtime, created_mtime))
+
+                        tqdm.write(f"   ✅ Downloaded: {file_path}")
+                        downloaded_files += 1
+                        downloaded_size += size
+                        return
+                    except Exception as e:
+                        # Don't leave a partial file behind for the skip check
+                        file_path.unlink(missing_ok=True)
+                        if attempt < MAX_RETRIES:
+                            delay = RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                            tqdm.write(f"   ⚠️ Attempt {attempt}/{MAX_RETRIES} failed for {name}: {e}. Retrying in {delay}s...")
+                            await asyncio.sleep(delay)
+                        else:
+                            tqdm.write(f"   ❌ Failed to download {name} after {MAX_RETRIES} attempts: {e}")
+                            failed_files += 1
+            finally:
+                pbar.update(1)
+
+    await asyncio.gather(*[fetch(*download) for download in downloads])
+    return downloaded_files, downloaded_size, failed_files
+
+
+async def process_file(xml_path, client, semaphore, dry_run, force, pbar):
+    """Parse one XML export and download its attachments.
+
+    Returns an (estimated_size, downloaded_files, downloaded_size,
+    skipped_files, failed_files) tuple so the caller can sum totals
+    across concurrently processed files. All output goes through
+    tqdm.write so concurrent files don't garble the shared bar.
     """
-    if not BASE_URL:
-        raise click.UsageError("JIRA_BASE_URL must be set in the .env file.")
+    estimated_size = 0
+    skipped_files = 0
 
-    # Resolve files from glob patterns
-    files = []
-    for pattern in file_patterns:
-        files.extend(glob.glob(pattern, recursive=True))
+    try:
+        # Parse the XML file off the event loop
+        issue_key, attachments = await asyncio.to_thread(parse_issue_xml, xml_path)
 
-    if not files:
-        print("❌ No files found matching the provided patterns.")
-        return
+        if not issue_key:
+            tqdm.write("❌ Issue key not found in XML.")
+            return estimated_size, 0, 0, skipped_files, 0
 
-    total_estimated_size = 0
-    total_downloaded_files = 0
-    total_skipped_files = 0
-    total_downloaded_size = 0
+        tqdm.write(f"🔑 Found issue key: {issue_key}")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context()
+        if not attachments:
+            tqdm.write("ℹ️ No attachments found in the XML file.")
+            return estimated_size, 0, 0, skipped_files, 0
 
-        # Load auth state if available
-        if AUTH_STATE_PATH.exists():
-            with open(AUTH_STATE_PATH, "r") as f:
-                storage_state = json.load(f)
-            context.add_cookies(storage_state.get("cookies", []))
+        downloads = []
+        logs = []
 
-        page = context.new_page()
+        output_dir = xml_path.parent / "attachments" / issue_key
 
-        for file in files:
-            xml_path = Path(file)
-            if not xml_path.is_file():
-                print(f"❌ File not found: {file}")
+        # One scandir instead of a stat per attachment; a missing
+        # directory just means nothing has been downloaded yet
+        existing_mtimes = {}
+        if not dry_run and not force:
+            try:
+                with os.scandir(output_dir) as entries:
+                    existing_mtimes = {entry.name: entry.stat().st_mtime for entry in entries}
+            except FileNotFoundError:
+                pass
+
+        # Queue downloads
+        for attachment in attachments:
+            name = attachment.get("name")
+            attachment_id = attachment.get("id")
+            size = int(attachment.get("size", 0))
+            created = attachment.get("created")
+
+            estimated_size += size
+
+            if not name or not attachment_id or not created:
+                logs.append("❌ Malformed attachment element. Skipping...")
                 continue
 
-            try:
-                # Parse the XML file
-                tree = ET.parse(xml_path)
-                root = tree.getroot()
-
-                # Extract issue key
-                issue_key = root.find(".//key").text.strip()
-                if not issue_key:
-                    print("❌ Issue key not found in XML.")
-                    continue
-
-                print(f"🔑 Found issue key: {issue_key}")
-
-                # Find all attachments
-                attachments = root.findall(".//attachments/attachment")
-                if not attachments:
-                    print("ℹ️ No attachments found in the XML file.")
-                    continue
-
-                downloads = []
-                logs = []
-
-                # Queue downloads
-                for attachment in attachments:
-                    name = attachment.attrib.get("name")
-                    attachment_id = attachment.attrib.get("id")
-                    size = int(attachment.attrib.get("size", 0))
-                    created = attachment.attrib.get("created")
-
-                    total_estimated_size += size
-
-                    if not name or not attachment_id or not created:
-                        logs.append("❌ Malformed attachment element. Skipping...")
+            # Construct download URL with URL encoding for the file name
+            encoded_name = quote(name)
+            download_url = f"{BASE_URL}/secure/attachment/{attachment_id}/{encoded_name}"
+
+            logs.append(f"📎 Queued attachment: {name}")
+            logs.append(f"   ↪️ URL: {download_url}")
+            logs.append(f"   ↪️ Size: {size / 1024:.2f} KB")
+
+            if not dry_run:
+                file_path = output_dir / f"ID-{attachment_id}__{name}"
+                # Parse the created timestamp once; it is needed for both
+                # the skip check and restoring the file's mtime
+                created_mtime = mktime(strptime(created, "%a, %d %b %Y %H:%M:%S %z"))
+
+                # Files whose timestamp already matches never reach
+                # the download queue
+                if not force:
+                    existing_mtime = existing_mtimes.get(file_path.name)
+                    if existing_mtime is not None and abs(existing_mtime - created_mtime) < 1:
+                        logs.append(f"   ↩️ Skipped (Timestamp match): {file_path}")
+                        skipped_files += 1
                         continue
 
-                    # Construct download URL with URL encoding for the file name
-                    encoded_name = quote(name)
-                    download_url = f"{BASE_URL}/secure/attachment/{attachment_id}/{encoded_name}"
-
-                    logs.append(f"📎 Queued attachment: {name}")
-                    logs.append(f"   ↪️ URL: {download_url}")
-                    logs.append(f"   ↪️ Size: {size / 1024:.2f} KB")
-
-                    if not dry_run:
-                        file_path = xml_path.parent / "attachments" / issue_key / f"ID-{attachment_id}__{name}"
-                        downloads.append((download_url, file_path, name, created, size))
-
-                # Print queued logs
-                for log in logs:
-                    print(log)
-
-                # Show progress bar before starting downloads
-                if not dry_run and downloads:
-                    with tqdm(total=len(downloads), unit="file", desc=f"Downloading attachments for {issue_key}") as pbar:
-                        # Prepare output directory
-                        output_dir = xml_path.parent / "attachments" / issue_key
-                        try:
-                            output_dir.mkdir(parents=True, exist_ok=True)
-                        except OSError as e:
-                            print(f"❌ Failed to create directory {output_dir}: {e}")
-                            continue
-
-                        # Download attachments
-                        for download_url, file_path, name, created, size in downloads:
-                            try:
-                                if file_path.exists() and not force:
-                                    # Check existing file's timestamp
-                                    existing_mtime = file_path.stat().st_mtime
-                                    expected_mtime = mktime(strptime(created, "%a, %d %b %Y %H:%M:%S %z"))
-
-                                    if abs(existing_mtime - expected_mtime) < 1:
-                                        print(f"   ↩️ Skipped (Timestamp match): {file_path}")
-                                        total_skipped_files += 1
-                                        pbar.update(1)
-                                        continue
-
-                                response = page.request.get(download_url)
-                                if response.status != 200:
-                                    print(f"❌ Authentication or network error: Received HTTP {response.status} for {download_url}")
-                                    exit(1)
-
-                                with open(file_path, "wb") as f:
-                                    f.write(response.body())
-
-                                # Set the created timestamp on the file
-                                file_mtime = mktime(strptime(created, "%a, %d %b %Y %H:%M:%S %z"))
-                                os.utime(file_path, (file_mtime, file_mtime))
-
-                                print(f"   ✅ Downloaded: {file_path}")
-                                total_downloaded_files += 1
-                                total_downloaded_size += size
-                            except Exception as e:
-                                print(f"   ❌ Failed to download {name}: {e}")
-                                print("Stopping further downloads due to error.")
-                                break
-                            finally:
-                                pbar.update(1)
-
-            except ET.ParseError as e:
-                print(f"❌ Failed to parse XML file: {e}")
-            except Exception as e:
-                print(f"❌ Unexpected error: {e}")
-
-        context.close()
-        browser.close()
+                downloads.append((download_url, file_path, name, created_mtime, size))
+
+        # Print queued logs
+        for log in logs:
+            tqdm.write(log)
+
+        # Grow the shared progress bar before starting downloads
+        if not dry_run and downloads:
+            # Prepare output directory
+            try:
+                output_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                tqdm.write(f"❌ Failed to create directory {output_dir}: {e}")
+                return estimated_size, 0, 0, skipped_files, 0
+
+            pbar.total = (pbar.total or 0) + len(downloads)
+            pbar.refresh()
+
+            # Download attachments concurrently
+            downloaded, downloaded_size, failed = await download_attachments(
+                client, downloads, semaphore, pbar
+            )
+            return estimated_size, downloaded, downloaded_size, skipped_files, failed
+
+    except etree.XMLSyntaxError as e:
+        tqdm.write(f"❌ Failed to parse XML file: {e}")
+    except Exception as e:
+        tqdm.write(f"❌ Unexpected error: {e}")
+
+    return estimated_size, 0, 0, skipped_files, 0
+
+
+async def run(file_patterns, dry_run, force, max_concurrency):
+    # Resolve files from glob patterns
+    files = []
+    for pattern in file_patterns:
+        files.extend(glob.glob(pattern, recursive=True))
+
+    if not files:
+        print("❌ No files found matching the provided patterns.")
+        return
+
+    # Bound concurrent downloads across the whole run
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # Bound how many XML files are in flight at once
+    file_semaphore = asyncio.Semaphore(MAX_PARALLEL_FILES)
+
+    async def worker(file, client, pbar):
+        xml_path = Path(file)
+        if not xml_path.is_file():
+            tqdm.write(f"❌ File not found: {file}")
+            return 0, 0, 0, 0, 0
+        async with file_semaphore:
+            return await process_file(xml_path, client, semaphore, dry_run, force, pbar)
+
+    # One shared progress bar for the whole run — per-file bars written by
+    # concurrent tasks garble each other. Each file grows the total as its
+    # downloads are queued; log lines go through tqdm.write.
+    # One client for the whole batch: every XML file's downloads share the
+    # same authenticated session and warmed connection. Dry runs never open
+    # a connection at all.
+    with tqdm(total=0, unit="file", desc="Downloading attachments", disable=dry_run) as pbar:
+        if dry_run:
+            results = await asyncio.gather(*[worker(file, None, pbar) for file in files])
+        else:
+            async with build_client() as client:
+                results = await asyncio.gather(*[worker(file, client, pbar) for file in files])
+
+    total_estimated_size = sum(r[0] for r in results)
+    total_downloaded_files = sum(r[1] for r in results)
+    total_downloaded_size = sum(r[2] for r in results)
+    total_skipped_files = sum(r[3] for r in results)
+    total_failed_files = sum(r[4] for r in results)
 
     # Final summary
     if dry_run:
@@ -178,6 +284,26 @@ def main(file_patterns, dry_run, force):
         print(f"✅ Total files downloaded: {total_downloaded_files}")
         print(f"📦 Total downloaded size (this run): {total_downloaded_size / (1024 * 1024):.2f} MB")
         print(f"↩️ Total files skipped: {total_skipped_files}")
+        if total_failed_files:
+            print(f"❌ Total files failed: {total_failed_files}")
+
+
+@click.command()
+@click.argument("file_patterns", nargs=-1)
+@click.option("--dry-run", is_flag=True, help="Simulate the download and display the attachment details.")
+@click.option("--force", is_flag=True, help="Force download of all files, regardless of existing timestamps.")
+@click.option("--max-concurrency", default=5, show_default=True, help="Maximum number of attachment downloads in flight at once.")
+def main(file_patterns, dry_run, force, max_concurrency):
+    """
+    Extract attachments from one or more Jira XML export files and optionally download them. For each file, a new directory named after the issue key will be created at the same path level as the input FILE.
+
+    FILE_PATTERNS are the glob patterns for the XML files.
+    """
+    if not BASE_URL:
+        raise click.UsageError("JIRA_BASE_URL must be set in the .env file.")
+
+    asyncio.run(run(file_patterns, dry_run, force, max_concurrency))
+
 
 if __name__ == "__main__":
     main()
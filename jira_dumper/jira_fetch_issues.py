@@ -1,10 +1,14 @@
 #!/usr/bin/env python3
 import os
 import csv
+import json
+import asyncio
+from operator import itemgetter
 from datetime import datetime, timedelta
 from pathlib import Path
 from dotenv import load_dotenv
 import click
+import httpx
 from playwright.sync_api import sync_playwright
 
 # Load environment variables from .env file
@@ -23,92 +27,101 @@ if not OUTPUT_DIR.exists():
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 DEFAULT_BASE_URL = os.getenv("JIRA_BASE_URL")
-RESULTS_COUNT_SELECTOR = "span.results-count-total.results-count-link"
-RESULT_THRESHOLD = 500  # Maximum allowable results before splitting the date range
-PAGE_SIZE = 50  # Default Jira page size
+SEARCH_ENDPOINT = "/rest/api/2/search"
+PAGE_SIZE = 100  # maxResults per /search request
 
-def scrape_project(project, start_date, end_date, base_url, page):
-    """Scrape issues for a specific project within a date range."""
+def login_and_get_cookies(base_url):
+    """Return session cookies, running the manual Playwright login flow if needed.
+
+    The browser is only used to establish the session; all searching goes
+    through the REST API.
+    """
+    if os.path.exists(STORAGE_STATE_PATH):
+        print(f"🔐 Using existing login state from: {STORAGE_STATE_PATH}")
+        with open(STORAGE_STATE_PATH, "r") as f:
+            return json.load(f).get("cookies", [])
+
+    print("🟡 No stored login state found. Starting manual login flow...")
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=False)
+        context = browser.new_context()
+        page = context.new_page()
+        page.goto(f"{base_url}/login")
+        input("Please log in and press ENTER to continue...")
+        context.storage_state(path=STORAGE_STATE_PATH)
+        cookies = context.cookies()
+        browser.close()
+    return cookies
+
+
+def build_client(cookies):
+    """Build an async HTTP client carrying the authenticated session cookies."""
+    jar = httpx.Cookies()
+    for cookie in cookies:
+        jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+    # Force a single HTTP/2 connection: search pages are many small objects,
+    # so multiplexing them over one warmed connection beats opening new ones.
+    return httpx.AsyncClient(
+        cookies=jar,
+        http2=True,
+        http1=False,
+        limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+        timeout=httpx.Timeout(30.0),
+        follow_redirects=True,
+    )
+
+
+async def search_page(client, base_url, jql, start_at):
+    """Fetch one page of search results from the REST API."""
+    response = await client.get(
+        f"{base_url}{SEARCH_ENDPOINT}",
+        params={"jql": jql, "startAt": start_at, "maxResults": PAGE_SIZE, "fields": "summary"},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def scrape_project(project, start_date, end_date, base_url, client):
+    """Fetch issues for a specific project within a date range via the search API."""
     output_file = OUTPUT_DIR / f"{project}.csv"
-    issue_data = []
 
-    def get_results_count():
-        """Extract total results count from the page."""
-        count_element = page.query_selector(RESULTS_COUNT_SELECTOR)
-        return int(count_element.text_content()) if count_element else 0
-
-    current_start = start_date
-
-    while current_start < end_date:
-        current_end = current_start + timedelta(days=180)  # Initial range: 6 months
-
-        # Dynamically adjust date range until the results are within the threshold
-        while True:
-            jql = (
-                f'project={project} AND created >= "{current_start.strftime("%Y-%m-%d")}" '
-                f'AND created < "{current_end.strftime("%Y-%m-%d")}" ORDER BY created DESC'
-            )
-            print(f"🚀 Processing JQL: {jql}")
-            page.goto(f"{base_url}/issues/?jql={jql}")
-
-            results_count = get_results_count()
-            if results_count == 0:
-                print(f"❌ No results found for JQL: {jql}")
-                break
-            elif results_count > RESULT_THRESHOLD:
-                print(f"⚠️ Results count ({results_count}) exceeds threshold. Reducing date range.")
-                # Halve the range and retry
-                current_end = current_start + (current_end - current_start) / 2
-            else:
-                print(f"✅ Results count: {results_count}. Proceeding with pagination.")
-                break  # Exit the loop when results are within threshold
-
-        # Paginate through the results within the adjusted range
-        start_index = 0
-        while True:
-            paginated_url = f"{base_url}/issues/?jql={jql}&startIndex={start_index}"
-            print(f"🌐 Fetching: {paginated_url}")
-            page.goto(paginated_url)
-
-            # Check for issue rows
-            ROW_SELECTOR = "tr.issuerow"
-            issue_rows = page.query_selector_all(ROW_SELECTOR)
-
-            if not issue_rows:
-                print("🏁 No more issues found or end of pagination.")
-                break
-
-            # Collect issue data
-            for row in issue_rows:
-                id_attr = row.get_attribute("rel")
-                key = row.get_attribute("data-issuekey")
-                link_element = row.query_selector("td.issuekey a.issue-link")
-                summary_element = row.query_selector("td.summary a.issue-link")
-
-                href = link_element.get_attribute("href") if link_element else None
-                summary = summary_element.text_content() if summary_element else None
-                if id_attr and key and href:
-                    url = base_url + href if href.startswith("/") else href
-                    issue_data.append((int(id_attr), key, summary.strip() if summary else "", url))
-
-            print(f"✅ Collected {len(issue_rows)} issue rows. Total so far: {len(issue_data)}")
-
-            # Check for next page
-            start_index += PAGE_SIZE
-            nav_next_selector = "a.nav-next"
-            nav_next = page.query_selector(nav_next_selector)
-
-            if not nav_next:
-                print("🏁 Reached the last page for this query.")
-                break
-
-        # Move to the next date range chunk
-        current_start = current_end
+    jql = (
+        f'project={project} AND created >= "{start_date.strftime("%Y-%m-%d")}" '
+        f'AND created < "{end_date.strftime("%Y-%m-%d")}" ORDER BY created DESC'
+    )
+    print(f"🚀 Processing JQL: {jql}")
+
+    # First page tells us the total; remaining pages are fetched concurrently
+    try:
+        first_page = await search_page(client, base_url, jql, 0)
+        total = first_page.get("total", 0)
+
+        if total == 0:
+            print(f"❌ No results found for JQL: {jql}")
+            return
+
+        print(f"✅ Results count: {total}. Proceeding with pagination.")
+        pages = [first_page]
+        remaining = range(PAGE_SIZE, total, PAGE_SIZE)
+        pages.extend(await asyncio.gather(*[search_page(client, base_url, jql, start_at) for start_at in remaining]))
+    except httpx.HTTPError as e:
+        print(f"❌ Search failed for {project}: {e}. Skipping project...")
+        return
+
+    # Collect issue data
+    issue_data = []
+    for page in pages:
+        for issue in page.get("issues", []):
+            issue_id = issue.get("id")
+            key = issue.get("key")
+            summary = (issue.get("fields") or {}).get("summary") or ""
+            if issue_id and key:
+                issue_data.append((int(issue_id), key, summary.strip(), f"{base_url}/browse/{key}"))
 
     # Write results to CSV
-    issue_data.sort(key=lambda x: x[0])
+    issue_data.sort(key=itemgetter(0))
     with open(output_file, "w", newline="") as f:
-        writer = csv.writer(f)
+        writer = csv.writer(f, lineterminator="\n")
         writer.writerow(["id", "key", "summary", "url"])
         writer.writerows(issue_data)
     print(f"📁 Saved {len(issue_data)} issues to {output_file}")
@@ -128,20 +141,14 @@ def main(projects, start_date, end_date, base_url):
     start_date = datetime.strptime(start_date, "%Y-%m-%d")
     end_date = datetime.strptime(end_date, "%Y-%m-%d")
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context(storage_state=STORAGE_STATE_PATH) if os.path.exists(STORAGE_STATE_PATH) else browser.new_context()
-        page = context.new_page()
-
-        if not os.path.exists(STORAGE_STATE_PATH):
-            page.goto(f"{base_url}/login")
-            input("Please log in and press ENTER to continue...")
-            context.storage_state(path=STORAGE_STATE_PATH)
+    cookies = login_and_get_cookies(base_url)
 
-        for project in projects:
-            scrape_project(project, start_date, end_date, base_url, page)
+    async def run():
+        async with build_client(cookies) as client:
+            for project in projects:
+                await scrape_project(project, start_date, end_date, base_url, client)
 
-        browser.close()
+    asyncio.run(run())
 
 if __name__ == "__main__":
     main()